@@ -6,12 +6,53 @@ Uses dark theme and Altair for visualizations.
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import altair as alt
 from datetime import datetime, date, timedelta
+from functools import lru_cache
 from utils.strava_api import get_access_token, fetch_activities, fetch_athlete
-from utils.transforms import normalize_activities
-from utils.kpis import distance_this_week, distance_this_month, distance_this_year, count_activities
+from utils.transforms import normalize_activities, aggregate_by_period
+from utils.kpis import compute_kpis
+
+# Maximum number of points sent to the browser for point-mark charts
+MAX_CHART_POINTS = 2000
+
+# Descriptive text for each volume granularity
+GRANULARITY_TEXT = {
+    "Day": "Daily",
+    "Week": "Weekly",
+    "Month": "Monthly"
+}
+
+# Target distance per volume granularity
+TARGET_DISTANCES = {
+    "Day": 3000,  # meters
+    "Week": 7000,  # meters
+    "Month": 28000  # meters
+}
+
+LIGHT_BLUE = "#60a5fa"  # Tailwind blue-400
+GREEN = "#10b981"  # Tailwind emerald-500 for target line
+
+# Columns embedded in the scatter plot's Vega-Lite spec
+SCATTER_COLUMNS = ["date", "name", "distance_km", "pace_s_per_100m", "sport_type"]
+
+# Hash frames by the fingerprint stamped in load_normalized / filter_dataframe instead of
+# their contents; an unstamped frame raises KeyError rather than silently sharing a cache key
+FINGERPRINT_HASH_FUNCS = {pd.DataFrame: lambda df: df.attrs["_fingerprint"]}
+
+# Activity table columns and their display labels
+DISPLAY_COLUMNS = {
+    "date": "Date",
+    "sport_type": "Sport",
+    "name": "Activity Name",
+    "distance_km": "Distance (km)",
+    "moving_time": "Moving Time (s)",
+    "pace_s_per_100m": "Pace (s/100m)",
+}
 
 # Page configuration
 st.set_page_config(
@@ -22,18 +63,45 @@ st.set_page_config(
 )
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
+@st.cache_resource(ttl=3000, show_spinner=False)  # Refresh before Strava's token lifetime runs out
+def _auth(client_id: str, client_secret: str, refresh_token: str = None, access_token: str = None):
+    """
+    Obtain a Strava access token, cached separately from the activity data.
+    
+    Kept out of load_activities so a token refresh never forces a re-fetch of
+    activities, and shared with load_athlete so a cold start performs a single
+    OAuth round-trip. Uses cache_resource since the token is a plain string that
+    doesn't need pickling. Failed lookups are evicted by the caller. When this
+    entry expires, get_access_token reuses the refreshed token until Strava's
+    expires_at, so only a real expiry costs an OAuth round-trip.
+    
+    Returns:
+        Access token string if successful, None otherwise
+    """
+    return get_access_token(
+        client_id=client_id,
+        client_secret=client_secret,
+        refresh_token=refresh_token,
+        access_token=access_token
+    )
+
+
+@st.cache_data(persist="disk", show_spinner=False)  # Survives restarts; cleared via Refresh button
 def load_activities():
     """
     Load activities from Strava API.
     
     This function:
     1. Reads Strava credentials from Streamlit secrets
-    2. Obtains an access token via OAuth refresh
+    2. Obtains an access token via OAuth refresh (cached separately in _auth)
     3. Fetches activities with pagination
-    4. Returns raw activities DataFrame
+    4. Returns raw activities as an Arrow table
     
-    Cached to avoid hitting API on every rerun (cleared via button or cache invalidation).
+    Cached to disk to avoid hitting API on every rerun and on every app restart
+    (cleared via button or cache invalidation). Returning an Arrow table keeps
+    the per-rerun cache read a buffer copy instead of unpickling a DataFrame of
+    nested Python objects. Empty results and partial downloads (flagged with
+    _mark_incomplete) are evicted by the caller so failures are never persisted.
     """
     try:
         secrets = st.secrets["strava"]
@@ -44,33 +112,146 @@ def load_activities():
     except KeyError as e:
         st.error(f"Missing required Strava secret: {e}. Please configure secrets in .streamlit/secrets.toml")
         st.info("Required: client_id, client_secret. Optional: refresh_token OR access_token")
-        return pd.DataFrame()
+        return pa.table({})
     
     # Validate that we have either refresh_token or access_token
     if not refresh_token and not access_token:
         st.error("Either 'refresh_token' or 'access_token' must be provided in secrets.")
-        return pd.DataFrame()
+        return pa.table({})
     
     # Get access token (will use refresh_token to get new one, or validate existing access_token)
-    access_token = get_access_token(
-        client_id=client_id,
-        client_secret=client_secret,
-        refresh_token=refresh_token,
-        access_token=access_token
-    )
+    access_token = _auth(client_id, client_secret, refresh_token, access_token)
     
     if not access_token:
+        # Don't keep a failed token lookup cached
+        _auth.clear()
         st.error("Failed to obtain valid access token. Check your credentials.")
         st.info("Make sure your refresh_token is valid or provide a valid access_token in secrets.")
-        return pd.DataFrame()
+        return pa.table({})
     
     # Fetch activities
     with st.spinner("Fetching activities from Strava..."):
         activities_df = fetch_activities(access_token, per_page=200, max_pages=5)
     
     if activities_df.empty:
-        st.warning("No activities found. Make sure you have activities in your Strava account.")
-        return pd.DataFrame()
+        if activities_df.attrs.get("complete", True):
+            st.warning("No activities found. Make sure you have activities in your Strava account.")
+        return pa.table({})
+    
+    activities_table = pa.Table.from_pandas(activities_df, preserve_index=False)
+    if not activities_df.attrs.get("complete", True):
+        activities_table = _mark_incomplete(activities_table)
+    return activities_table
+
+
+def _mark_incomplete(table: pa.Table) -> pa.Table:
+    """Flag a table built from a failed or partial fetch, via its schema metadata."""
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), b"incomplete": b"1"})
+
+
+def _is_complete(table: pa.Table) -> bool:
+    """Whether a fetched table was not flagged by _mark_incomplete."""
+    return b"incomplete" not in (table.schema.metadata or {})
+
+
+@st.cache_data(ttl=600, show_spinner=False)  # Re-checked every 10 minutes or via Refresh button
+def load_new_activities(after: int) -> pa.Table:
+    """
+    Fetch only the activities started after the most recent downloaded one.
+    
+    Lets the Refresh button pull new activities (usually zero or one page)
+    instead of re-downloading the whole history in load_activities.
+    
+    Args:
+        after: Epoch seconds of the most recent activity already loaded
+        
+    Returns:
+        New raw activities as an Arrow table, empty if there are none or fetch fails
+    """
+    try:
+        secrets = st.secrets["strava"]
+        client_id = secrets["client_id"]
+        client_secret = secrets["client_secret"]
+        refresh_token = secrets.get("refresh_token")
+        access_token = secrets.get("access_token")
+    except KeyError:
+        return pa.table({})
+    
+    access_token = _auth(client_id, client_secret, refresh_token, access_token)
+    
+    if not access_token:
+        _auth.clear()
+        return pa.table({})
+    
+    with st.spinner("Checking Strava for new activities..."):
+        activities_df = fetch_activities(access_token, per_page=200, max_pages=5, after=after)
+    
+    if activities_df.empty:
+        return pa.table({})
+    
+    return pa.Table.from_pandas(activities_df, preserve_index=False)
+
+
+def _latest_start_epoch(raw_activities: pa.Table):
+    """Epoch seconds of the most recent activity start, None if unavailable."""
+    if "start_date" not in raw_activities.column_names:
+        return None
+    latest = pc.max(raw_activities["start_date"]).as_py()  # ISO 8601 UTC strings sort chronologically
+    return int(pd.Timestamp(latest).timestamp()) if latest else None
+
+
+def _merge_new_activities(raw_activities: pa.Table, new_activities: pa.Table) -> pa.Table:
+    """
+    Prepend newly fetched activities to the downloaded ones, skipping ids already present.
+    
+    Args:
+        raw_activities: Full download from load_activities
+        new_activities: Incremental fetch from load_new_activities
+        
+    Returns:
+        Combined Arrow table
+    """
+    if new_activities.num_rows == 0:
+        return raw_activities
+    
+    seen = pc.is_in(new_activities["id"], value_set=raw_activities["id"].combine_chunks())
+    new_activities = new_activities.filter(pc.invert(seen))
+    
+    # New activities may carry fields the older download lacks (or vice versa)
+    return pa.concat_tables([new_activities, raw_activities], promote_options="permissive")
+
+
+@st.cache_data(
+    persist="disk",
+    show_spinner=False,
+    hash_funcs={pa.Table: lambda t: (t.num_rows, t["id"][-1].as_py() if "id" in t.column_names and t.num_rows else 0)}
+)
+def load_normalized(raw_activities: pa.Table) -> pd.DataFrame:
+    """
+    Normalize raw activities, cached to disk alongside the raw table.
+    
+    The raw table is keyed on (row count, last activity id) instead of
+    Streamlit's default full-content hash, which is O(n) on every rerun.
+    It is only converted to pandas on a cache miss.
+    
+    Args:
+        raw_activities: Raw activities Arrow table from load_activities
+        
+    Returns:
+        Normalized activities DataFrame
+    """
+    # Sort chronologically once so date filters can binary-search instead of scanning
+    # No self_destruct: the caller still holds raw_activities, and freeing its buffers would crash later reads
+    activities_df = normalize_activities(raw_activities.to_pandas(split_blocks=True))
+    if not activities_df.empty:
+        activities_df = activities_df.sort_values("date").reset_index(drop=True)
+    
+    # Stamp a cheap fingerprint used as the cache key by downstream cached helpers, and the
+    # date bounds used by the sidebar (ISO strings, since Streamlit JSON-serializes attrs)
+    if not activities_df.empty:
+        activities_df.attrs["_fingerprint"] = (len(activities_df), activities_df["date"].iloc[-1].value)
+        activities_df.attrs["date_min"] = activities_df["date"].min().date().isoformat()
+        activities_df.attrs["date_max"] = activities_df["date"].max().date().isoformat()
     
     return activities_df
 
@@ -95,15 +276,11 @@ def load_athlete():
     if not refresh_token and not access_token:
         return None
     
-    # Get access token
-    access_token = get_access_token(
-        client_id=client_id,
-        client_secret=client_secret,
-        refresh_token=refresh_token,
-        access_token=access_token
-    )
+    # Get access token (shared with load_activities, so only one OAuth round-trip)
+    access_token = _auth(client_id, client_secret, refresh_token, access_token)
     
     if not access_token:
+        _auth.clear()
         return None
     
     # Fetch athlete profile
@@ -111,13 +288,66 @@ def load_athlete():
     return athlete
 
 
-def filter_dataframe(df: pd.DataFrame, date_range: tuple[date, date], sport_type: str) -> pd.DataFrame:
+@st.cache_data(show_spinner=False)
+def _age_from_dob(dob: str, today: date):
+    """
+    Compute age in years from a Strava date of birth string.
+    
+    Args:
+        dob: Date of birth as YYYY-MM-DD (may be None)
+        today: Reference date; part of the cache key so age rolls over on birthdays
+        
+    Returns:
+        Age in years, or None if dob is missing or malformed
+    """
+    if not dob:
+        return None
+    try:
+        birth_date = datetime.strptime(dob, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def _date_bound(day: date, tz) -> np.datetime64:
+    """Midnight of `day` in timezone `tz`, as the naive UTC datetime64 used by Series.values."""
+    ts = pd.Timestamp(day, tz=tz)
+    if tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_datetime64()
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FINGERPRINT_HASH_FUNCS)
+def sport_positions(df: pd.DataFrame) -> dict:
+    """
+    Map each sport type to the row positions holding it, computed once per frame.
+    
+    Args:
+        df: Normalized activities DataFrame with categorical sport_type
+        
+    Returns:
+        Dictionary of sport type -> integer positions array
+    """
+    codes = df["sport_type"].cat.codes.to_numpy()
+    return {
+        sport: np.flatnonzero(codes == i)
+        for i, sport in enumerate(df["sport_type"].cat.categories)
+    }
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FINGERPRINT_HASH_FUNCS)
+def filter_dataframe(df: pd.DataFrame, start_date: date, end_date: date, sport_type: str) -> pd.DataFrame:
     """
     Apply global filters to the activities DataFrame.
     
+    Cached on (frame fingerprint, start_date, end_date, sport_type) so widget
+    interactions that don't touch the filters skip re-filtering. Expects the
+    frame sorted by date, as returned by load_normalized.
+    
     Args:
-        df: Normalized activities DataFrame
-        date_range: Tuple of (start_date, end_date)
+        df: Normalized activities DataFrame (stamped by load_normalized)
+        start_date: Start of the date range (inclusive)
+        end_date: End of the date range (inclusive)
         sport_type: Filter by sport type ("Run", "Ride", or "All")
         
     Returns:
@@ -126,31 +356,154 @@ def filter_dataframe(df: pd.DataFrame, date_range: tuple[date, date], sport_type
     if df.empty:
         return df
     
-    filtered = df.copy()
+    # Rows are sorted by date (see load_normalized), so the inclusive date range maps
+    # to a contiguous [lo, hi) slice found by binary search - no per-row mask
+    tz = df["date"].dt.tz
+    dates = df["date"].values
+    lo = np.searchsorted(dates, _date_bound(start_date, tz), side="left") if start_date else 0
+    hi = np.searchsorted(dates, _date_bound(end_date + timedelta(days=1), tz), side="left") if end_date else len(df)
     
-    # Date range filter - apply both start and end dates inclusively
-    start_date, end_date = date_range
-    if start_date and end_date:
-        # Ensure date column is datetime for proper comparison
-        date_series = pd.to_datetime(filtered["date"]).dt.date
-        filtered = filtered[
-            (date_series >= start_date) & 
-            (date_series <= end_date)
-        ]
-    elif start_date:
-        date_series = pd.to_datetime(filtered["date"]).dt.date
-        filtered = filtered[date_series >= start_date]
-    elif end_date:
-        date_series = pd.to_datetime(filtered["date"]).dt.date
-        filtered = filtered[date_series <= end_date]
-    
-    # Sport type filter
+    # Sport type filter - precomputed positions are ascending, so clip them to [lo, hi) the same way
     if sport_type != "All":
-        filtered = filtered[filtered["sport_type"] == sport_type]
+        positions = sport_positions(df).get(sport_type, np.empty(0, dtype=np.intp))
+        positions = positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+        filtered = df.iloc[positions]
+    else:
+        filtered = df.iloc[lo:hi]
+    
+    # Stamp the filter into the fingerprint so cached consumers key on it, not the source frame
+    filtered.attrs["_fingerprint"] = (df.attrs["_fingerprint"], str(start_date), str(end_date), sport_type)
     
     return filtered
 
 
+@st.cache_data(show_spinner=False, hash_funcs=FINGERPRINT_HASH_FUNCS)
+def load_kpis(filtered_df: pd.DataFrame, today: date):
+    """
+    Compute dashboard KPIs for the filtered activities, cached per filter selection.
+    
+    Args:
+        filtered_df: Filtered activities DataFrame (stamped by filter_dataframe)
+        today: Current date; part of the cache key so week/month/year roll over
+        
+    Returns:
+        KPIs namedtuple of (week, month, year, count)
+    """
+    return compute_kpis(filtered_df, today)
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FINGERPRINT_HASH_FUNCS)
+def load_volume(filtered_df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """
+    Aggregate filtered activities by period, cached per filter selection and period.
+    
+    Args:
+        filtered_df: Filtered activities DataFrame (stamped by filter_dataframe)
+        period: One of "day", "week", "month", or "year"
+        
+    Returns:
+        Aggregated DataFrame from aggregate_by_period
+    """
+    return aggregate_by_period(filtered_df, period)
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FINGERPRINT_HASH_FUNCS)
+def load_csv(table_display: pd.DataFrame, labels: dict) -> bytes:
+    """
+    Serialize the activity table for download, cached per filter selection.
+    
+    Args:
+        table_display: Table as shown in the app (stamped by filter_dataframe)
+        labels: Mapping of column names to CSV header labels
+        
+    Returns:
+        UTF-8 encoded CSV
+    """
+    return table_display.rename(columns=labels).to_csv(
+        index=False, date_format="%Y-%m-%d %H:%M", float_format="%.2f"
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _volume_chart_template() -> alt.Chart:
+    """Data-less volume bar chart, built once per process; attach data with .properties(data=...)."""
+    return (
+        alt.Chart()
+        .mark_bar(color=LIGHT_BLUE, stroke="darkslateblue", strokeWidth=1)
+        # Convert distance to meters for y-axis in the browser instead of adding a column
+        .transform_calculate(total_distance_m='datum.total_distance_km * 1000')
+        .encode(
+            x=alt.X(
+                'period_start:T',
+                title=None,
+                scale=alt.Scale(paddingInner=0.4, paddingOuter=0.2),
+                axis=alt.Axis(
+                    format='%Y-%m-%d',
+                    labelAngle=-45,
+                    labelFontSize=9
+                )
+            ),
+            y=alt.Y('total_distance_m:Q', title=None),
+            tooltip=[
+                alt.Tooltip('period_start:T', format='%Y-%m-%d', title='Date'),
+                alt.Tooltip('total_distance_m:Q', format='.0f', title='Distance (m)'),
+                alt.Tooltip('activity_count:Q', format='.0f', title='Activities')
+            ]
+        )
+        .properties(
+            width=600,
+            height=300
+        )
+    )
+
+
+@lru_cache(maxsize=8)
+def _target_line(target_distance: int) -> alt.Chart:
+    """Dashed target rule at target_distance meters, built once per target."""
+    # Create target line data
+    target_data = pd.DataFrame({
+        'target': [target_distance]
+    })
+    
+    return (
+        alt.Chart(target_data)
+        .mark_rule(
+            color=GREEN,
+            strokeDash=[5, 5],
+            strokeWidth=2
+        )
+        .encode(
+            y=alt.Y('target:Q', title=None),
+            tooltip=alt.Tooltip('target:Q', format='.0f', title='Target (m)')
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def _scatter_chart_template() -> alt.Chart:
+    """Data-less distance vs pace scatter plot, built once per process."""
+    return alt.Chart().mark_circle(size=60).encode(
+        x=alt.X(
+            "distance_km:Q",
+            title="Distance (km)"
+        ),
+        y=alt.Y(
+            "pace_s_per_100m:Q",
+            title="Pace (s/100m)"
+        ),
+        tooltip=[
+            alt.Tooltip("date:T", title="Date", format="%Y-%m-%d"),
+            alt.Tooltip("name:N", title="Activity"),
+            alt.Tooltip("distance_km:Q", title="Distance (km)", format=".2f"),
+            alt.Tooltip("pace_s_per_100m:Q", title="Pace (s/100m)", format=".2f"),
+            alt.Tooltip("sport_type:N", title="Sport")
+        ]
+    ).properties(
+        width=600,
+        height=400
+    )
+
+
 def main():
     """Main application entry point."""
     
@@ -167,15 +520,7 @@ def main():
         athlete_name = athlete_name.strip() if athlete_name.strip() else athlete.get("username", "Athlete")
         
         # Calculate age from date of birth if available
-        dob = athlete.get("dateofbirth")
-        age = None
-        if dob:
-            try:
-                birth_date = datetime.strptime(dob, "%Y-%m-%d").date()
-                today = date.today()
-                age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-            except:
-                pass
+        age = _age_from_dob(athlete.get("dateofbirth"), date.today())
         
         # Display athlete profile
         profile_text = f"Athlete: **{athlete_name}**"
@@ -184,14 +529,31 @@ def main():
         
         st.markdown(profile_text)
     
-    # Load raw activities (cached)
-    raw_activities = load_activities()
-    
-    if raw_activities.empty:
-        st.stop()
-    
-    # Normalize activities
-    activities_df = normalize_activities(raw_activities)
+    # Load raw activities (cached), or the partial download kept for this session
+    raw_activities = st.session_state.get("partial_activities")
+    if raw_activities is None:
+        raw_activities = load_activities()
+        
+        if raw_activities.num_rows == 0:
+            # Don't keep a failed (or empty) download cached; fetch again on the next run
+            load_activities.clear()
+            st.stop()
+        
+        # Show a partial download (a page failed or the rate limit was low) but don't persist it.
+        # Keep it for the session so reruns don't re-fetch (and spend rate limit) until
+        # Refresh or Re-download is clicked
+        if not _is_complete(raw_activities):
+            load_activities.clear()
+            st.session_state["partial_activities"] = raw_activities
+    
+    # Add activities uploaded since the full download (re-checked by the Refresh button)
+    after = _latest_start_epoch(raw_activities)
+    if after is not None:
+        # A failed check is retried when the TTL expires or Refresh is clicked, not on every rerun
+        raw_activities = _merge_new_activities(raw_activities, load_new_activities(after))
+    
+    # Normalize activities (cached)
+    activities_df = load_normalized(raw_activities)
     
     if activities_df.empty:
         st.warning("No activities after normalization. Check date filters.")
@@ -202,14 +564,33 @@ def main():
         st.header("Controls")
         
         if st.button("🔄 Refresh Data from Strava", use_container_width=True):
-            st.cache_data.clear()
+            # Only fetch what's new; the full download stays cached on disk (a partial one is retried)
+            load_new_activities.clear()
+            load_athlete.clear()
+            st.session_state.pop("partial_activities", None)
+            st.session_state.pop("sport_types", None)
+            st.rerun()
+        
+        if st.button(
+            "⬇️ Re-download All Activities",
+            use_container_width=True,
+            help="Fetch the full history again, picking up edited or deleted activities"
+        ):
+            load_activities.clear()
+            load_new_activities.clear()
+            load_athlete.clear()
+            # Edits keep the row count and ids, so the derived caches' keys wouldn't change
+            for cached in (load_normalized, sport_positions, filter_dataframe, load_kpis, load_volume, load_csv):
+                cached.clear()
+            st.session_state.pop("partial_activities", None)
+            st.session_state.pop("sport_types", None)
             st.rerun()
         
         st.divider()
         
         # Date range selectors - separate inputs
-        min_date = activities_df["date"].dt.date.min()
-        max_date = activities_df["date"].dt.date.max()
+        min_date = date.fromisoformat(activities_df.attrs["date_min"])
+        max_date = date.fromisoformat(activities_df.attrs["date_max"])
         
         # Calculate default start date: minimum date with activity in current year
         current_year = date.today().year
@@ -217,38 +598,33 @@ def main():
             activities_df["date"].dt.year == current_year
         ]
         if not current_year_activities.empty:
-            default_start_date = current_year_activities["date"].dt.date.min()
+            default_start_date = current_year_activities["date"].min().date()
         else:
             # Fallback to overall min_date if no activities in current year
             default_start_date = min_date
         
-        start_date = st.date_input(
-            "Start Date",
-            value=default_start_date,
-            min_value=min_date,
-            max_value=max_date,
-            help="Select the start date for analysis"
-        )
-        
-        end_date = st.date_input(
-            "End Date",
-            value=max_date,
+        # Range mode validates start <= end in the widget itself
+        date_range = st.date_input(
+            "Date Range",
+            value=(default_start_date, max_date),
             min_value=min_date,
             max_value=max_date,
-            help="Select the end date for analysis"
+            help="Select the date range for analysis"
         )
         
-        # Ensure start_date <= end_date
-        if start_date > end_date:
-            st.warning("Start date must be before or equal to end date. Adjusting start date.")
-            start_date = end_date
-        
-        date_range = (start_date, end_date)
+        # Streamlit returns a single date until the second endpoint is picked
+        if isinstance(date_range, tuple) and len(date_range) == 2:
+            start_date, end_date = date_range
+        else:
+            start_date = date_range[0] if isinstance(date_range, tuple) and date_range else default_start_date
+            end_date = max_date
         
-        sport_types = ["All"] + sorted(activities_df["sport_type"].unique().tolist())
+        # Sport types only change when data is refreshed, so compute them once per session
+        if "sport_types" not in st.session_state:
+            st.session_state["sport_types"] = ["All"] + list(activities_df["sport_type"].cat.categories)
         selected_sport = st.selectbox(
             "Sport Type",
-            options=sport_types,
+            options=st.session_state["sport_types"],
             index=0,
             help="Filter activities by sport type"
         )
@@ -266,7 +642,7 @@ def main():
         st.divider()
     
     # Apply filters
-    filtered_df = filter_dataframe(activities_df, date_range, selected_sport)
+    filtered_df = filter_dataframe(activities_df, start_date, end_date, selected_sport)
     
     if filtered_df.empty:
         st.warning("No activities match the selected filters.")
@@ -278,129 +654,46 @@ def main():
     
     kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
     
+    kpis = load_kpis(filtered_df, date.today())
+    
     with kpi_col1:
-        week_dist = distance_this_week(filtered_df)
-        st.metric("Distance This Week", f"{week_dist:.1f} km")
+        st.metric("Distance This Week", f"{kpis.week:.1f} km")
     
     with kpi_col2:
-        month_dist = distance_this_month(filtered_df)
-        st.metric("Distance This Month", f"{month_dist:.1f} km")
+        st.metric("Distance This Month", f"{kpis.month:.1f} km")
     
     with kpi_col3:
-        year_dist = distance_this_year(filtered_df)
-        st.metric("Distance This Year (YTD)", f"{year_dist:.1f} km")
+        st.metric("Distance This Year (YTD)", f"{kpis.year:.1f} km")
     
     with kpi_col4:
-        activity_count = count_activities(filtered_df)
-        st.metric("Total Workouts", f"{activity_count}")
-    
-      # Add descriptive text based on granularity
-    granularity_text = {
-        "Day": "Daily",
-        "Week": "Weekly",
-        "Month": "Monthly"
-    }
+        st.metric("Total Workouts", f"{kpis.count}")
     
     # Volume section
     st.divider()
-    st.subheader(f"Training Volume ({granularity_text.get(granularity, granularity)})")
+    st.subheader(f"Training Volume ({GRANULARITY_TEXT.get(granularity, granularity)})")
         
     # Set target distance based on granularity
-    target_distances = {
-        "Day": 3000,  # meters
-        "Week": 7000,  # meters
-        "Month": 28000  # meters
-    }
-    target_distance = target_distances.get(granularity)
+    target_distance = TARGET_DISTANCES.get(granularity)
     
     # Display target distance if available
     if target_distance is not None:
         st.markdown(f"Target Distance  {target_distance} m")
     
-    # Aggregate by selected period using pandas date truncation
+    # Aggregate by selected period (cached per filter selection and granularity)
     if not filtered_df.empty:
-        # Map granularity to pandas frequency
-        freq_map = {
-            "Day": "D",
-            "Week": "W",
-            "Month": "M"
-        }
-        freq = freq_map[granularity]
-        
-        # Ensure date column is timezone-naive datetime
-        df_for_agg = filtered_df.copy()
-        df_for_agg['date'] = pd.to_datetime(df_for_agg['date']).dt.tz_localize(None).dt.normalize()
-        
-        # Aggregate using pd.Grouper (equivalent to SQL DATE_TRUNC)
-        aggregated = df_for_agg.groupby(pd.Grouper(key='date', freq=freq)).agg({
-            'distance_km': 'sum',
-            'sport_type': 'count'
-        }).reset_index()
-        aggregated.columns = ['date', 'total_distance_km', 'activity_count']
-        
-        # Remove rows with no activities (only show actual data)
-        aggregated = aggregated[aggregated['activity_count'] > 0].copy()
+        aggregated = load_volume(filtered_df, granularity.lower())
         
         if not aggregated.empty:
-            # Sort by date
-            aggregated = aggregated.sort_values('date')
-            
-            # Convert distance to meters for y-axis
-            aggregated['total_distance_m'] = aggregated['total_distance_km'] * 1000
+            # Only embed the columns the chart encodes in the Vega-Lite spec; each bucket
+            # is plotted at the first day of its period
+            aggregated = aggregated[['period_start', 'total_distance_km', 'activity_count']]
             
-            # Create bar chart with light blue color
-            light_blue = "#60a5fa"  # Tailwind blue-400
-            green = "#10b981"  # Tailwind emerald-500 for target line
-            
-            # Create base bar chart
-            bar_chart = (
-                alt.Chart(aggregated)
-                .mark_bar(color=light_blue, stroke="darkslateblue", strokeWidth=1)
-                .encode(
-                    x=alt.X(
-                        'date:T',
-                        title=None,
-                        scale=alt.Scale(paddingInner=0.4, paddingOuter=0.2),
-                        axis=alt.Axis(
-                            format='%Y-%m-%d',
-                            labelAngle=-45,
-                            labelFontSize=9
-                        )
-                    ),
-                    y=alt.Y('total_distance_m:Q', title=None),
-                    tooltip=[
-                        alt.Tooltip('date:T', format='%Y-%m-%d'),
-                        alt.Tooltip('total_distance_m:Q', format='.0f', title='Distance (m)'),
-                        alt.Tooltip('activity_count:Q', format='.0f', title='Activities')
-                    ]
-                )
-                .properties(
-                    width=600,
-                    height=300
-                )
-            )
+            # Chart templates are built once per process; only the data changes per rerun
+            bar_chart = _volume_chart_template().properties(data=aggregated)
             
             # Add target line if target distance is set
             if target_distance is not None:
-                # Create target line data
-                target_data = pd.DataFrame({
-                    'target': [target_distance]
-                })
-                
-                target_line = (
-                    alt.Chart(target_data)
-                    .mark_rule(
-                        color=green,
-                        strokeDash=[5, 5],
-                        strokeWidth=2
-                    )
-                    .encode(
-                        y=alt.Y('target:Q', title=None),
-                        tooltip=alt.Tooltip('target:Q', format='.0f', title='Target (m)')
-                    )
-                )
-                
-                chart = (bar_chart + target_line)
+                chart = (bar_chart + _target_line(target_distance))
             else:
                 chart = bar_chart
             
@@ -412,111 +705,53 @@ def main():
     st.divider()
     st.subheader("Distance vs Pace")
     
-    # Prepare data for scatter plot
-    scatter_df = filtered_df.copy()
-    
-    # Calculate pace in seconds per 100 meters if not available
-    if "pace_s_per_100m" not in scatter_df.columns:
-        if "pace_s_per_km" in scatter_df.columns:
-            scatter_df["pace_s_per_100m"] = scatter_df["pace_s_per_km"] / 10.0
-        elif "pace_min_per_km" in scatter_df.columns:
-            scatter_df["pace_s_per_100m"] = (scatter_df["pace_min_per_km"] * 60) / 10.0
-    
-    # Filter out invalid pace values
-    if "pace_s_per_100m" in scatter_df.columns:
-        scatter_df = scatter_df[
-            scatter_df["pace_s_per_100m"].notna() & 
-            (scatter_df["pace_s_per_100m"] > 0) &
-            scatter_df["distance_km"].notna() &
-            (scatter_df["distance_km"] > 0)
-        ].copy()
+    # Filter out invalid pace values with one fused NumPy mask (NaN compares False, so
+    # the > 0 checks also drop missing values). Pace is computed in normalize_activities.
+    pace = filtered_df["pace_s_per_100m"].to_numpy(dtype="float64")
+    dist = filtered_df["distance_km"].to_numpy(dtype="float64")
+    scatter_df = filtered_df.iloc[(pace > 0) & (dist > 0)]
+    
+    if not scatter_df.empty:
+        # Cap the points embedded in the Vega-Lite spec; browser render time scales with point count
+        if len(scatter_df) > MAX_CHART_POINTS:
+            scatter_df = scatter_df.sample(MAX_CHART_POINTS, random_state=0)
         
-        if not scatter_df.empty:
-            # Create scatter plot
-            scatter_chart = alt.Chart(scatter_df).mark_circle(size=60).encode(
-                x=alt.X(
-                    "distance_km:Q",
-                    title="Distance (km)"
-                ),
-                y=alt.Y(
-                    "pace_s_per_100m:Q",
-                    title="Pace (s/100m)"
-                ),
-                tooltip=[
-                    alt.Tooltip("date:T", title="Date", format="%Y-%m-%d"),
-                    alt.Tooltip("name:N", title="Activity"),
-                    alt.Tooltip("distance_km:Q", title="Distance (km)", format=".2f"),
-                    alt.Tooltip("pace_s_per_100m:Q", title="Pace (s/100m)", format=".2f"),
-                    alt.Tooltip("sport_type:N", title="Sport")
-                ]
-            ).properties(
-                width=600,
-                height=400
-            )
-            
-            st.altair_chart(scatter_chart, use_container_width=True)
-        else:
-            st.info("No activities with valid pace and distance data available.")
+        # Only embed the columns the chart encodes in the Vega-Lite spec
+        scatter_df = scatter_df[[col for col in SCATTER_COLUMNS if col in scatter_df.columns]]
+        
+        # Create scatter plot
+        scatter_chart = _scatter_chart_template().properties(data=scatter_df)
+        
+        st.altair_chart(scatter_chart, use_container_width=True)
     else:
-        st.info("Pace data not available for scatter plot.")
+        st.info("No activities with valid pace and distance data available.")
     
     # Data table section
     st.divider()
     st.subheader("Activity Data")
     
-    # Prepare table data
-    table_df = filtered_df.copy()
-    
-    # Calculate pace in seconds per 100 meters
-    if "pace_s_per_100m" in table_df.columns:
-        pace_col = "pace_s_per_100m"
-    elif "pace_s_per_km" in table_df.columns:
-        # Calculate from seconds per km: divide by 10
-        table_df["pace_s_per_100m"] = table_df["pace_s_per_km"] / 10.0
-        pace_col = "pace_s_per_100m"
-    elif "pace_min_per_km" in table_df.columns:
-        # Calculate from minutes per km: convert to seconds per km, then divide by 10
-        table_df["pace_s_per_100m"] = (table_df["pace_min_per_km"] * 60) / 10.0
-        pace_col = "pace_s_per_100m"
-    else:
-        pace_col = None
-    
-    # Format columns for display
-    display_columns = {
-        "date": "Date",
-        "sport_type": "Sport",
-        "name": "Activity Name",
-        "distance_km": "Distance (km)",
-        "moving_time": "Moving Time (s)",
-    }
-    
-    if pace_col:
-        display_columns[pace_col] = "Pace (s/100m)"
-    
-    # Select and rename columns
-    available_cols = [col for col in display_columns.keys() if col in table_df.columns]
-    table_display = table_df[available_cols].copy()
-    table_display = table_display.rename(columns=display_columns)
-    
-    # Format date
-    if "Date" in table_display.columns:
-        table_display["Date"] = table_display["Date"].dt.strftime("%Y-%m-%d %H:%M")
-    
-    # Format pace as seconds per 100m (simple number format)
-    if "Pace (s/100m)" in table_display.columns:
-        table_display["Pace (s/100m)"] = table_display["Pace (s/100m)"].apply(
-            lambda x: f"{x:.2f}" if pd.notna(x) and x > 0 else "N/A"
-        )
-    
-    # Format distance
-    if "Distance (km)" in table_display.columns:
-        table_display["Distance (km)"] = table_display["Distance (km)"].apply(lambda x: f"{x:.2f}")
-    
-    # Display table
-    st.table(table_display)
+    # Select display columns (column selection already returns a new frame, so no copy);
+    # labels come from column_config rather than renaming the frame
+    available_cols = [col for col in DISPLAY_COLUMNS.keys() if col in filtered_df.columns]
+    table_display = filtered_df[available_cols].iloc[::-1]  # Newest first
+    
+    # Display table - values stay numeric and are formatted client-side
+    column_config = {col: label for col, label in DISPLAY_COLUMNS.items() if col in available_cols}
+    column_config.update({
+        "date": st.column_config.DatetimeColumn("Date", format="YYYY-MM-DD HH:mm"),
+        "distance_km": st.column_config.NumberColumn("Distance (km)", format="%.2f"),
+        "pace_s_per_100m": st.column_config.NumberColumn("Pace (s/100m)", format="%.2f"),
+    })
+    
+    st.dataframe(
+        table_display,
+        column_config=column_config,
+        hide_index=True,
+        use_container_width=True
+    )
     
-    # Download button
-    csv = table_display.to_csv(index=False)
+    # Download button (CSV is only rebuilt when the filters change)
+    csv = load_csv(table_display, DISPLAY_COLUMNS)
     st.download_button(
         label="📥 Download Data as CSV",
         data=csv,
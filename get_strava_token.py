@@ -12,6 +12,12 @@ import webbrowser
 from pathlib import Path
 import json
 
+try:
+    import tomllib  # Python 3.11+
+except ModuleNotFoundError:
+    tomllib = None
+    import toml
+
 
 def load_client_credentials():
     """Load client_id and client_secret from secrets.toml."""
@@ -22,22 +28,21 @@ def load_client_credentials():
         return None, None
     
     try:
-        # Simple TOML parsing for just the strava section
-        with open(secrets_path, "r") as f:
-            content = f.read()
-        
-        # Extract client_id and client_secret
-        client_id = None
-        client_secret = None
-        
-        for line in content.split("\n"):
-            line = line.strip()
-            if line.startswith("client_id") and "=" in line:
-                client_id = line.split("=", 1)[1].strip().strip('"').strip("'")
-            elif line.startswith("client_secret") and "=" in line:
-                client_secret = line.split("=", 1)[1].strip().strip('"').strip("'")
+        if tomllib is not None:
+            with open(secrets_path, "rb") as f:
+                secrets = tomllib.load(f)
+        else:
+            with open(secrets_path, "r") as f:
+                secrets = toml.load(f)
         
-        return client_id, client_secret
+        # client_id is often written unquoted (an integer) in TOML; normalize to strings
+        strava = secrets.get("strava", {})
+        client_id = strava.get("client_id")
+        client_secret = strava.get("client_secret")
+        return (
+            str(client_id) if client_id is not None else None,
+            str(client_secret) if client_secret is not None else None
+        )
     except Exception as e:
         print(f"Error loading credentials: {e}")
         return None, None
@@ -10,12 +10,18 @@ This script:
 import requests
 import toml
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Tuple, List
 
 
+# Shared session so the validate/refresh/fetch steps reuse one connection to strava.com
+_SESSION = requests.Session()
+
+
+@lru_cache(maxsize=1)
 def load_secrets():
-    """Load Strava credentials from secrets.toml file."""
+    """Load Strava credentials from secrets.toml file (read and parsed once per process)."""
     secrets_path = Path(__file__).parent / ".streamlit" / "secrets.toml"
     
     if not secrets_path.exists():
@@ -42,7 +48,7 @@ def validate_access_token(access_token: str) -> Tuple[bool, List[str]]:
     headers = {"Authorization": f"Bearer {access_token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _SESSION.get(url, headers=headers, timeout=10)
         if response.ok:
             athlete = response.json()
             print(f"✓ Access token is valid!")
@@ -80,7 +86,7 @@ def get_access_token_from_refresh(client_id: str, client_secret: str, refresh_to
     
     try:
         print("Attempting to refresh access token...")
-        response = requests.post(url, data=payload, timeout=10)
+        response = _SESSION.post(url, data=payload, timeout=10)
         
         if not response.ok:
             error_data = response.json() if response.text else {}
@@ -119,7 +125,7 @@ def fetch_test_activities(access_token: str, limit: int = 5):
     
     try:
         print(f"\nFetching {limit} activities...")
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = _SESSION.get(url, headers=headers, params=params, timeout=10)
         
         if not response.ok:
             error_data = response.json() if response.text else {}
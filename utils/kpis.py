@@ -5,10 +5,30 @@ Computes key performance indicators like weekly, monthly, and yearly distance to
 All functions operate on filtered DataFrames that respect user-selected date ranges and filters.
 """
 
+import numpy as np
 import pandas as pd
+from collections import namedtuple
 from datetime import datetime, date, timedelta
 
 
+KPIs = namedtuple("KPIs", ["week", "month", "year", "count"])
+
+
+def _frame_tz(df: pd.DataFrame):
+    """Timezone of the date column, read from attrs set by normalize_activities when present."""
+    if "tz" in df.attrs:
+        return df.attrs["tz"]
+    return df["date"].dt.tz
+
+
+def _today(df: pd.DataFrame, today: date = None) -> pd.Timestamp:
+    """Midnight of `today` (default: the current date) in the frame's timezone; every KPI period ends on this day."""
+    tz = _frame_tz(df)
+    if today is None:
+        return pd.Timestamp.now(tz=tz).normalize()
+    return pd.Timestamp(today, tz=tz)
+
+
 def get_current_period_dates() -> tuple[date, date]:
     """
     Get date range for current week, month, and year calculations.
@@ -20,73 +40,77 @@ def get_current_period_dates() -> tuple[date, date]:
     return (date.min, today)
 
 
-def distance_this_week(df: pd.DataFrame) -> float:
+def distance_this_week(df: pd.DataFrame, today: date = None) -> float:
     """
     Calculate total distance for the current week (Monday to Sunday).
     
     Args:
         df: Normalized activities DataFrame (should be filtered by date range if needed)
+        today: Reference date picking the week (defaults to the current date)
         
     Returns:
-        Total distance in kilometers for the current week
+        Total distance in kilometers for the week containing `today`
     """
     if df.empty:
         return 0.0
     
-    today = pd.Timestamp.now(tz=df["date"].dt.tz if df["date"].dt.tz is not None else None).normalize()
+    today = _today(df, today)
     
-    # Get Monday of current week
+    # Get Monday of current week; the week ends before the following Monday
     days_since_monday = today.weekday()
     week_start = today - pd.Timedelta(days=days_since_monday)
-    week_end = week_start + pd.Timedelta(days=6)
+    week_end = week_start + pd.Timedelta(days=7)
     
-    mask = (df["date"].dt.date >= week_start.date()) & (df["date"].dt.date <= week_end.date())
+    # Compare timestamps directly rather than materializing Python date objects
+    mask = (df["date"] >= week_start) & (df["date"] < week_end)
     return df.loc[mask, "distance_km"].sum()
 
 
-def distance_this_month(df: pd.DataFrame) -> float:
+def distance_this_month(df: pd.DataFrame, today: date = None) -> float:
     """
     Calculate total distance for the current month.
     
     Args:
         df: Normalized activities DataFrame
+        today: Reference date (defaults to the current date); activities after it are excluded
         
     Returns:
-        Total distance in kilometers for the current month
+        Month-to-date distance in kilometers as of `today`
     """
     if df.empty:
         return 0.0
     
-    today = pd.Timestamp.now(tz=df["date"].dt.tz if df["date"].dt.tz is not None else None)
+    today = _today(df, today)
     
-    # First day of current month
+    # First day of current month, up to the end of today (exclusive next midnight)
     month_start = today.replace(day=1).normalize()
-    month_end = today.normalize()
+    next_day = today + pd.Timedelta(days=1)
     
-    mask = (df["date"] >= month_start) & (df["date"] <= month_end)
+    mask = (df["date"] >= month_start) & (df["date"] < next_day)
     return df.loc[mask, "distance_km"].sum()
 
 
-def distance_this_year(df: pd.DataFrame) -> float:
+def distance_this_year(df: pd.DataFrame, today: date = None) -> float:
     """
     Calculate total distance for the current year (year-to-date).
     
     Args:
         df: Normalized activities DataFrame
+        today: Reference date (defaults to the current date); activities after it are excluded
         
     Returns:
-        Total distance in kilometers for the current year
+        Year-to-date distance in kilometers as of `today`
     """
     if df.empty:
         return 0.0
     
-    today = pd.Timestamp.now(tz=df["date"].dt.tz if df["date"].dt.tz is not None else None)
+    today = _today(df, today)
     
-    # First day of current year
+    # First day of current year, up to the end of today (exclusive next midnight)
     year_start = today.replace(month=1, day=1).normalize()
-    year_end = today.normalize()
+    next_day = today + pd.Timedelta(days=1)
     
-    mask = (df["date"] >= year_start) & (df["date"] <= year_end)
+    mask = (df["date"] >= year_start) & (df["date"] < next_day)
     return df.loc[mask, "distance_km"].sum()
 
 
@@ -102,3 +126,51 @@ def count_activities(df: pd.DataFrame) -> int:
     """
     return len(df)
 
+
+def _to_datetime64(ts: pd.Timestamp) -> np.datetime64:
+    """Convert a (possibly tz-aware) Timestamp to the naive UTC datetime64 used by Series.values."""
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_datetime64()
+
+
+def compute_kpis(df: pd.DataFrame, today: date = None) -> KPIs:
+    """
+    Calculate week, month, and year distance totals plus activity count in one pass.
+    
+    Equivalent to calling distance_this_week, distance_this_month, distance_this_year
+    and count_activities, but "today" and the period cutoffs are computed once and
+    all three masks are built against the same NumPy date/distance arrays.
+    
+    Args:
+        df: Normalized activities DataFrame (already filtered by user selections)
+        today: Reference date bounding every period: its Monday-to-Sunday week, and
+            month-to-date / year-to-date up to the end of that day (defaults to the current date)
+        
+    Returns:
+        KPIs namedtuple of (week, month, year, count), distances in kilometers
+    """
+    if df.empty:
+        return KPIs(0.0, 0.0, 0.0, 0)
+    
+    today = _today(df, today)
+    week_start = today - pd.Timedelta(days=today.weekday())
+    week_end = week_start + pd.Timedelta(days=7)
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+    next_day = _to_datetime64(today + pd.Timedelta(days=1))
+    
+    dates = df["date"].values
+    # Zero out missing distances once so each total is a plain dot product
+    dist = np.nan_to_num(df["distance_km"].to_numpy(dtype="float64"))
+    
+    mask_week = (dates >= _to_datetime64(week_start)) & (dates < _to_datetime64(week_end))
+    mask_month = (dates >= _to_datetime64(month_start)) & (dates < next_day)
+    mask_year = (dates >= _to_datetime64(year_start)) & (dates < next_day)
+    
+    return KPIs(
+        week=float(dist @ mask_week),
+        month=float(dist @ mask_month),
+        year=float(dist @ mask_year),
+        count=len(df)
+    )
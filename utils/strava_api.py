@@ -5,18 +5,114 @@ Handles OAuth token refresh and activity fetching from Strava Web API v3.
 Uses refresh token flow to obtain short-lived access tokens.
 """
 
+import random
+import time
 import requests
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
 
+try:
+    import orjson  # Optional: faster decoding of large activity pages
+except ImportError:
+    orjson = None
+
+
+# Upper bound on concurrent page requests, to stay polite with Strava's rate limits
+MAX_CONCURRENT_PAGES = 4
+
+# Rate limited or transient server errors, retried with exponential backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 3
+MAX_RETRY_WAIT = 10  # seconds; longer Retry-After waits are surfaced as errors instead
+
+# Activity fields kept from the API payload: those read by normalize_activities,
+# plus id and start_date used for caching and incremental sync
+ACTIVITY_FIELDS = [
+    "id",
+    "name",
+    "sport_type",
+    "start_date",
+    "start_date_local",
+    "distance",
+    "moving_time",
+    "elapsed_time",
+    "average_speed",
+]
+
+# Fields built directly as float64 arrays; the rest are inferred from flat column lists
+FLOAT_FIELDS = {"distance", "average_speed"}
+
+# Refreshed tokens are reused until this many seconds before Strava's expires_at
+TOKEN_EXPIRY_MARGIN = 60
+
+# (client_id, refresh_token) -> (access_token, expires_at epoch seconds)
+_TOKEN_CACHE = {}
+
+
+def _build_session() -> requests.Session:
+    """
+    Create the shared HTTP session used for all Strava calls.
+    
+    Keeps TCP/TLS connections to strava.com alive across token refresh, athlete
+    and activity requests. The adapter only retries connection failures; 429/5xx
+    responses are retried by _request_with_retry.
+    """
+    session = requests.Session()
+    # status=0 and ignoring Retry-After keep urllib3 from retrying 429/503 on its own
+    retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5, respect_retry_after_header=False)
+    # One pooled connection per concurrent page worker
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=MAX_CONCURRENT_PAGES, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+_SESSION = _build_session()
+
+
+def _request_with_retry(method: str, url: str, max_attempts: int = MAX_ATTEMPTS, **kwargs) -> requests.Response:
+    """
+    Send a request on the shared session, retrying 429/5xx with exponential backoff.
+    
+    Honors Retry-After (capped at MAX_RETRY_WAIT) and adds jitter so concurrent page
+    workers don't retry in lockstep. Makes no Streamlit calls, so it is safe to run
+    in worker threads.
+    
+    Args:
+        method: HTTP method
+        url: Request URL
+        max_attempts: Total number of attempts, including the first
+        **kwargs: Passed through to Session.request
+        
+    Returns:
+        The last response received, which may still be an error
+    """
+    for attempt in range(max_attempts):
+        response = _SESSION.request(method, url, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == max_attempts - 1:
+            break
+        
+        try:
+            wait = float(response.headers.get("Retry-After", 2 ** attempt))
+        except ValueError:
+            wait = 2 ** attempt
+        time.sleep(min(wait, MAX_RETRY_WAIT) + random.uniform(0, 0.5))
+    
+    return response
+
 
 def get_access_token(client_id: str, client_secret: str, refresh_token: str = None, access_token: str = None) -> Optional[str]:
     """
     Get access token for Strava API.
     
-    If access_token is provided, validates it first, then uses it if valid.
-    Otherwise, exchanges refresh_token for a new access token using Strava OAuth endpoint.
+    A token previously obtained from refresh_token is reused without any network
+    call until shortly before its expires_at. Otherwise, if access_token is provided,
+    validates it first, then uses it if valid. Failing that, exchanges refresh_token
+    for a new access token using Strava OAuth endpoint.
     
     Args:
         client_id: Strava application client ID
@@ -27,6 +123,11 @@ def get_access_token(client_id: str, client_secret: str, refresh_token: str = No
     Returns:
         Access token string if successful, None otherwise
     """
+    # Reuse a refreshed token while it is still valid (Strava tokens last 6 hours)
+    cached = _TOKEN_CACHE.get((client_id, refresh_token)) if refresh_token else None
+    if cached and time.time() < cached[1] - TOKEN_EXPIRY_MARGIN:
+        return cached[0]
+    
     # If access_token is provided, validate it first
     if access_token:
         if validate_access_token(access_token):
@@ -51,7 +152,7 @@ def get_access_token(client_id: str, client_secret: str, refresh_token: str = No
     }
     
     try:
-        response = requests.post(url, data=payload, timeout=10)
+        response = _request_with_retry("POST", url, data=payload, timeout=10)
         
         # Handle error responses with detailed messages
         if not response.ok:
@@ -69,7 +170,8 @@ def get_access_token(client_id: str, client_secret: str, refresh_token: str = No
         if not access_token:
             st.error("No access token in response from Strava.")
             return None
-            
+        
+        _TOKEN_CACHE[(client_id, refresh_token)] = (access_token, token_data.get("expires_at", 0))
         return access_token
         
     except requests.exceptions.RequestException as e:
@@ -91,7 +193,7 @@ def validate_access_token(access_token: str) -> bool:
     headers = {"Authorization": f"Bearer {access_token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _request_with_retry("GET", url, headers=headers, timeout=10)
         return response.ok
     except requests.exceptions.RequestException:
         return False
@@ -111,7 +213,7 @@ def fetch_athlete(access_token: str) -> Optional[dict]:
     headers = {"Authorization": f"Bearer {access_token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _request_with_retry("GET", url, headers=headers, timeout=10)
         
         if not response.ok:
             return None
@@ -121,80 +223,203 @@ def fetch_athlete(access_token: str) -> Optional[dict]:
         return None
 
 
-def fetch_activities(access_token: str, per_page: int = 200, max_pages: int = 5) -> pd.DataFrame:
+def _request_page(url: str, headers: dict, page: int, per_page: int, after: Optional[int] = None) -> requests.Response:
+    """
+    Request a single page of activities.
+    
+    Only performs the HTTP call (no Streamlit calls), so it is safe to run in worker threads.
+    """
+    params = {
+        "per_page": per_page,
+        "page": page
+    }
+    if after is not None:
+        params["after"] = after
+    return _request_with_retry("GET", url, headers=headers, params=params, timeout=10)
+
+
+def _decode_json(response: requests.Response):
+    """Decode a JSON response body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _parse_page(response: requests.Response, page: int) -> Optional[list]:
+    """
+    Parse a page of activities, reporting API errors.
+    
+    Args:
+        response: Response for the activities page
+        page: Page number (for error messages)
+        
+    Returns:
+        List of activity dicts, None if the response is an error
+    """
+    # Check for HTTP errors and handle them with detailed messages
+    if not response.ok:
+        error_data = {}
+        try:
+            error_data = _decode_json(response)
+        except:
+            pass
+        
+        error_msg = error_data.get("message", f"HTTP {response.status_code}")
+        st.error(f"Error fetching activities (page {page}): {error_msg}")
+        
+        if error_data.get("errors"):
+            for err in error_data["errors"]:
+                resource = err.get("resource", "")
+                field = err.get("field", "")
+                code = err.get("code", "")
+                st.error(f"  - {resource}.{field}: {code}")
+        
+        return None
+    
+    return _decode_json(response)
+
+
+def _remaining_requests(response: requests.Response) -> Optional[int]:
+    """
+    Requests left before hitting Strava's rate limit, read from response headers.
+    
+    Strava reports comma-separated (15-minute, daily) limit and usage pairs. Reads
+    count against the X-ReadRateLimit pair when present, else X-RateLimit.
+    
+    Args:
+        response: Any response from the Strava API
+        
+    Returns:
+        Remaining requests in the tighter window, None if the headers are missing
+    """
+    for prefix in ("X-ReadRateLimit", "X-RateLimit"):
+        limit = response.headers.get(f"{prefix}-Limit")
+        usage = response.headers.get(f"{prefix}-Usage")
+        if limit and usage:
+            try:
+                remaining = min(int(l) - int(u) for l, u in zip(limit.split(","), usage.split(",")))
+            except ValueError:
+                return None
+            return max(remaining, 0)
+    return None
+
+
+def _activities_frame(activities: list) -> pd.DataFrame:
+    """
+    Build a DataFrame holding only ACTIVITY_FIELDS from raw activity dicts.
+    
+    Each field is extracted into a flat column list rather than letting pandas infer
+    a frame from nested dicts, so unused payload (maps, athlete, segment data) is
+    dropped before it ever becomes a column.
+    
+    Args:
+        activities: Activity dicts as returned by the Strava API
+        
+    Returns:
+        DataFrame with one column per field present in the payload
+    """
+    columns = {}
+    for field in ACTIVITY_FIELDS:
+        values = [activity.get(field) for activity in activities]
+        if all(value is None for value in values):
+            continue
+        columns[field] = np.array(values, dtype="float64") if field in FLOAT_FIELDS else values
+    
+    return pd.DataFrame(columns)
+
+
+def fetch_activities(access_token: str, per_page: int = 200, max_pages: int = 5, after: Optional[int] = None) -> pd.DataFrame:
     """
     Fetch athlete activities from Strava API with pagination.
     
     Uses Strava's pagination (page parameter) to fetch multiple pages of activities.
-    Limits to max_pages to avoid excessive API calls.
+    Page 1 is fetched first; if it is full, the remaining pages are requested
+    concurrently (bounded by MAX_CONCURRENT_PAGES) and consumed in page order.
+    Limits to max_pages to avoid excessive API calls, and never fans out past the
+    rate limit budget Strava reports on page 1.
     
     Args:
         access_token: Valid Strava access token
         per_page: Number of activities per page (max 200)
         max_pages: Maximum number of pages to fetch
+        after: Optional epoch timestamp; only activities started after it are returned
         
     Returns:
-        DataFrame with activities data, empty DataFrame if fetch fails
+        DataFrame with the ACTIVITY_FIELDS columns, empty DataFrame if fetch fails.
+        attrs["complete"] is False when a page failed or the rate limit cut the fetch
+        short, i.e. the result may be partial.
     """
     url = "https://www.strava.com/api/v3/athlete/activities"
     
     headers = {"Authorization": f"Bearer {access_token}"}
     
     all_activities = []
-    page = 1
+    complete = True
     
-    while page <= max_pages:
-        params = {
-            "per_page": per_page,
-            "page": page
-        }
-        
+    budget = None
+    try:
+        response = _request_page(url, headers, 1, per_page, after)
+        budget = _remaining_requests(response)
+        activities = _parse_page(response, 1)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # ValueError covers a malformed JSON body (orjson and requests both raise subclasses)
+        st.error(f"Error fetching activities (page 1): {e}")
+        activities = None
+    
+    if activities is None:
+        complete = False
+    
+    if activities:
+        all_activities.extend(activities)
+    
+    # Only fan out when page 1 was full, i.e. more pages may exist
+    remaining_pages = list(range(2, max_pages + 1))
+    more_pages = bool(activities) and len(activities) >= per_page
+    
+    # Don't fan out past what's left of Strava's rate limit window
+    if more_pages and budget is not None and budget < len(remaining_pages):
+        st.warning("Approaching Strava's API rate limit; only the most recent activities were loaded.")
+        remaining_pages = remaining_pages[:budget]
+        # Truncated history: flag it so callers don't cache it as the full download
+        complete = False
+    
+    if more_pages and remaining_pages:
+        pool = ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_PAGES, len(remaining_pages)))
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            futures = [
+                pool.submit(_request_page, url, headers, page, per_page, after)
+                for page in remaining_pages
+            ]
             
-            # Check for HTTP errors and handle them with detailed messages
-            if not response.ok:
-                error_data = {}
+            # Consume in page order so results match a sequential fetch
+            for page, future in zip(remaining_pages, futures):
                 try:
-                    error_data = response.json()
-                except:
-                    pass
-                
-                error_msg = error_data.get("message", f"HTTP {response.status_code}")
-                st.error(f"Error fetching activities (page {page}): {error_msg}")
+                    activities = _parse_page(future.result(), page)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    st.error(f"Error fetching activities (page {page}): {e}")
+                    complete = False
+                    break
                 
-                if error_data.get("errors"):
-                    for err in error_data["errors"]:
-                        resource = err.get("resource", "")
-                        field = err.get("field", "")
-                        code = err.get("code", "")
-                        st.error(f"  - {resource}.{field}: {code}")
+                # Error response: later pages can't be trusted to follow on
+                if activities is None:
+                    complete = False
+                    break
                 
-                break
-            
-            activities = response.json()
-            
-            # If empty response, we've reached the end
-            if not activities:
-                break
+                # Empty response: we've reached the end
+                if not activities:
+                    break
                 
-            all_activities.extend(activities)
-            
-            # If we got fewer than per_page results, we're done
-            if len(activities) < per_page:
-                break
+                all_activities.extend(activities)
                 
-            page += 1
-            
-        except requests.exceptions.RequestException as e:
-            st.error(f"Network error fetching activities (page {page}): {e}")
-            break
+                # If we got fewer than per_page results, we're done
+                if len(activities) < per_page:
+                    break
+        finally:
+            # Drop any pages past the end that haven't started yet
+            pool.shutdown(wait=False, cancel_futures=True)
     
-    if not all_activities:
-        return pd.DataFrame()
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(all_activities)
+    # Convert to DataFrame, keeping only the fields used downstream
+    df = _activities_frame(all_activities) if all_activities else pd.DataFrame()
+    df.attrs["complete"] = complete
     
     return df
-
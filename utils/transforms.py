@@ -5,11 +5,46 @@ Processes raw Strava activity data into normalized, analysis-ready format.
 Computes pace, distance buckets, and aggregation keys for time-based analysis.
 """
 
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 from typing import Optional
 
 
+# Every label the distance bucketing can produce; used as the categories of distance_bucket
+DISTANCE_BUCKET_LABELS = [
+    "Unknown",
+    "<5K", "5-10K", "10K-Half", "Half-Full", ">Marathon",
+    "<20K", "20-50K", "50-100K", ">100K",
+    ">10K",
+]
+
+# Exclusive upper bin edges (km) and their bucket labels, per sport type
+DISTANCE_BUCKETS = {
+    "Run": ([5, 10, 21.1, 42.2], ["<5K", "5-10K", "10K-Half", "Half-Full", ">Marathon"]),
+    "Ride": ([20, 50, 100], ["<20K", "20-50K", "50-100K", ">100K"]),
+}
+
+# Generic buckets for other sports
+DEFAULT_DISTANCE_BUCKETS = ([5, 10], ["<5K", "5-10K", ">10K"])
+
+# Normalized columns stored as float32 / the smallest integer type that fits
+FLOAT_COLUMNS = ["distance_km", "pace_s_per_km", "pace_min_per_km", "pace_s_per_100m", "average_speed"]
+INTEGER_COLUMNS = ["moving_time", "elapsed_time", "year"]
+
+
+def _format_codes(codes: np.ndarray, formatter) -> pd.Categorical:
+    """Format each distinct period code once, as the (chronological) categories of a Categorical."""
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    return pd.Categorical.from_codes(inverse, categories=formatter(unique_codes))
+
+
+def _format_weeks(week_codes: np.ndarray) -> np.ndarray:
+    """Label Monday-based week codes as "YYYY-MM-DD/YYYY-MM-DD", like Period("W").astype(str)."""
+    week_start = (week_codes * 7 - 3).astype("datetime64[D]")
+    return np.char.add(np.char.add(week_start.astype(str), "/"), (week_start + 6).astype(str))
+
+
 def normalize_activities(df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalize raw Strava activities DataFrame into analysis-ready format.
@@ -25,13 +60,18 @@ def normalize_activities(df: pd.DataFrame) -> pd.DataFrame:
     
     Returns DataFrame with normalized columns:
     - date: date component (timezone-aware if possible)
-    - distance_km: distance in kilometers
-    - moving_time: moving time in seconds (preserved)
-    - pace_s_per_km: pace in seconds per kilometer (for running)
-    - pace_min_per_km: pace in minutes per kilometer (for running)
-    - year, year_week, year_month: aggregation keys
-    - distance_bucket: categorical distance ranges
-    - sport_type, name: preserved from original
+    - distance_km: distance in kilometers (float32)
+    - moving_time: moving time in seconds (downcast integer)
+    - pace_s_per_km: pace in seconds per kilometer (for running, float32)
+    - pace_min_per_km: pace in minutes per kilometer (for running, float32)
+    - year: aggregation key
+    - year_week, year_month, day: aggregation keys (category dtype)
+    - day_code, week_code, month_code, year_code: int32 period codes for grouping
+    - distance_bucket: categorical distance ranges (category dtype)
+    - sport_type: preserved from original (category dtype)
+    - name: preserved from original
+    
+    The date column's timezone is recorded in attrs["tz"] (as a string, None if naive).
     
     Assumptions:
     - Uses start_date_local for timezone-aware date handling
@@ -41,91 +81,91 @@ def normalize_activities(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame()
     
-    df = df.copy()
-    
-    # Parse start_date_local to datetime
+    # Parse start_date_local to datetime (kept aside so the caller's frame isn't modified)
     if "start_date_local" in df.columns:
-        df["date"] = pd.to_datetime(df["start_date_local"])
+        dates = pd.to_datetime(df["start_date_local"])
     elif "start_date" in df.columns:
-        df["date"] = pd.to_datetime(df["start_date"])
+        dates = pd.to_datetime(df["start_date"])
     else:
         raise ValueError("No date column found in activities data")
     
-    # Filter to last 2 years (configurable history window)
-    cutoff_date = pd.Timestamp.now(tz=df["date"].dt.tz) - pd.Timedelta(days=730)
-    df = df[df["date"] >= cutoff_date].copy()
-    
-    # Convert distance from meters to kilometers
-    df["distance_km"] = df["distance"] / 1000.0
+    # Filter to last 2 years (configurable history window). take() already returns
+    # a new frame that is safe to add columns to, so no extra copies are needed.
+    cutoff_date = pd.Timestamp.now(tz=dates.dt.tz) - pd.Timedelta(days=730)
+    keep = np.flatnonzero((dates >= cutoff_date).to_numpy())
+    df = df.take(keep)
+    df["date"] = dates.array.take(keep)
     
-    # Compute pace (seconds per km, minutes per km, and seconds per 100m)
-    # Only valid when distance > 0
-    mask_valid_distance = df["distance_km"] > 0
+    # Convert distance from meters to kilometers. The float64 values are kept for the
+    # pace and bucket computations below; the column itself is stored as float32.
+    distance_km = df["distance"].to_numpy(dtype="float64") / 1000.0
+    df["distance_km"] = distance_km.astype("float32")
     
-    df["pace_s_per_km"] = None
-    df["pace_min_per_km"] = None
-    df["pace_s_per_100m"] = None
+    # Compute pace (seconds per km, minutes per km, and seconds per 100m) in single
+    # vectorized passes, written straight into float32 columns. Only valid when
+    # distance > 0 (NaN otherwise).
+    moving_time = df["moving_time"].to_numpy(dtype="float64")
     
     # Pace = time / distance
-    df.loc[mask_valid_distance, "pace_s_per_km"] = (
-        df.loc[mask_valid_distance, "moving_time"] / 
-        df.loc[mask_valid_distance, "distance_km"]
+    df["pace_s_per_km"] = np.divide(
+        moving_time,
+        distance_km,
+        out=np.full(len(df), np.nan, dtype="float32"),
+        where=distance_km > 0
     )
+    df["pace_min_per_km"] = df["pace_s_per_km"] / np.float32(60.0)
     
-    df.loc[mask_valid_distance, "pace_min_per_km"] = (
-        df.loc[mask_valid_distance, "pace_s_per_km"] / 60.0
+    # Seconds per 100m = time / (distance in units of 100m)
+    distance_100m = distance_km * 10.0
+    df["pace_s_per_100m"] = np.divide(
+        moving_time,
+        distance_100m,
+        out=np.full(len(df), np.nan, dtype="float32"),
+        where=distance_100m > 0
     )
     
-    # Seconds per 100m = seconds per km / 10
-    df.loc[mask_valid_distance, "pace_s_per_100m"] = (
-        df.loc[mask_valid_distance, "pace_s_per_km"] / 10.0
-    )
+    # Categorical sport_type: equality filters compare integer codes, and the
+    # (sorted) distinct sport types are available via .cat.categories
+    if "sport_type" in df.columns:
+        df["sport_type"] = df["sport_type"].astype("category")
+    
+    # Integer period codes (days/weeks/months since epoch) used as cheap groupby keys.
+    # Computed from wall-clock dates, matching the local calendar of start_date_local.
+    local_dates = df["date"].dt.tz_localize(None) if df["date"].dt.tz is not None else df["date"]
+    day_code = local_dates.values.astype("datetime64[D]").astype("int64")
+    # 1970-01-01 was a Thursday; shift by 3 days so weeks start on Monday
+    week_code = (day_code + 3) // 7
+    month_code = local_dates.values.astype("datetime64[M]").astype("int64")
     
-    # Create aggregation keys
+    # Create aggregation keys; the string keys are categoricals whose labels are formatted
+    # once per distinct period from the codes rather than per row via Period objects
     df["year"] = df["date"].dt.year
-    df["year_week"] = df["date"].dt.to_period("W").astype(str)
-    df["year_month"] = df["date"].dt.to_period("M").astype(str)
-    df["day"] = df["date"].dt.strftime("%Y-%m-%d")
-    
-    # Create distance buckets (useful for analysis)
-    def get_distance_bucket(distance_km: float, sport_type: str) -> str:
-        """Categorize activity by distance range."""
-        if pd.isna(distance_km) or distance_km == 0:
-            return "Unknown"
-        
-        if sport_type == "Run":
-            if distance_km < 5:
-                return "<5K"
-            elif distance_km < 10:
-                return "5-10K"
-            elif distance_km < 21.1:
-                return "10K-Half"
-            elif distance_km < 42.2:
-                return "Half-Full"
-            else:
-                return ">Marathon"
-        elif sport_type == "Ride":
-            if distance_km < 20:
-                return "<20K"
-            elif distance_km < 50:
-                return "20-50K"
-            elif distance_km < 100:
-                return "50-100K"
-            else:
-                return ">100K"
-        else:
-            # Generic buckets for other sports
-            if distance_km < 5:
-                return "<5K"
-            elif distance_km < 10:
-                return "5-10K"
-            else:
-                return ">10K"
-    
-    df["distance_bucket"] = df.apply(
-        lambda row: get_distance_bucket(row["distance_km"], row.get("sport_type", "Unknown")),
-        axis=1
-    )
+    df["year_week"] = _format_codes(week_code, _format_weeks)
+    df["year_month"] = _format_codes(month_code, lambda codes: codes.astype("datetime64[M]").astype(str))
+    df["day"] = _format_codes(day_code, lambda codes: codes.astype("datetime64[D]").astype(str))
+    
+    df["day_code"] = day_code.astype("int32")
+    df["week_code"] = week_code.astype("int32")
+    df["month_code"] = month_code.astype("int32")
+    df["year_code"] = df["year"].astype("int32")
+    
+    # Create distance buckets (useful for analysis): each sport's exclusive upper
+    # edges are binary-searched at once instead of classifying row by row
+    bucket_codes = np.zeros(len(df), dtype="int8")  # 0 = "Unknown"
+    if "sport_type" in df.columns:
+        is_run = (df["sport_type"] == "Run").to_numpy()
+        is_ride = (df["sport_type"] == "Ride").to_numpy()
+    else:
+        is_run = is_ride = np.zeros(len(df), dtype=bool)
+    is_other = ~(is_run | is_ride)
+    
+    for mask, sport in ((is_run, "Run"), (is_ride, "Ride"), (is_other, None)):
+        edges, labels = DISTANCE_BUCKETS.get(sport, DEFAULT_DISTANCE_BUCKETS)
+        label_codes = np.array([DISTANCE_BUCKET_LABELS.index(label) for label in labels], dtype="int8")
+        bucket_codes[mask] = label_codes[np.searchsorted(edges, distance_km[mask], side="right")]
+    
+    bucket_codes[np.isnan(distance_km) | (distance_km == 0)] = 0
+    df["distance_bucket"] = pd.Categorical.from_codes(bucket_codes, categories=DISTANCE_BUCKET_LABELS)
     
     # Select and order relevant columns for analysis
     columns_to_keep = [
@@ -143,20 +183,56 @@ def normalize_activities(df: pd.DataFrame) -> pd.DataFrame:
         "year_week",
         "year_month",
         "day",
+        "day_code",
+        "week_code",
+        "month_code",
+        "year_code",
         "distance_bucket"
     ]
     
-    # Keep only columns that exist
+    # Downcast numeric columns (float32 / smallest int) to halve memory, chart payloads
+    # and the bandwidth of KPI and groupby scans. Floats are cast explicitly, since
+    # to_numeric(downcast="float") keeps float64 whenever float32 would round a value.
+    # Cast on the working frame before selecting, so no column is written to a subset
+    # (pandas 2.x raises SettingWithCopyWarning for that).
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and df[col].dtype != "float32":
+            df[col] = df[col].astype("float32")
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    
+    # Keep only columns that exist (column selection already returns a new frame)
     available_columns = [col for col in columns_to_keep if col in df.columns]
-    df_normalized = df[available_columns].copy()
+    df_normalized = df[available_columns]
+    
+    # Record the timezone once so KPI functions don't re-derive it via the .dt accessor.
+    # Stored as a string since attrs must stay serializable.
+    tz = df_normalized["date"].dt.tz
+    df_normalized.attrs["tz"] = str(tz) if tz is not None else None
     
     return df_normalized
 
 
+def _period_start(codes: np.ndarray, period: str) -> np.ndarray:
+    """Convert integer period codes back to the first day of each period."""
+    codes = codes.astype("int64")
+    if period == "day":
+        return codes.astype("datetime64[D]")
+    if period == "week":
+        return (codes * 7 - 3).astype("datetime64[D]")
+    if period == "month":
+        return codes.astype("datetime64[M]").astype("datetime64[D]")
+    return (codes - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+
+
 def aggregate_by_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
     """
     Aggregate activities by time period (day, week, month, or year).
     
+    Groups on the integer period codes computed in normalize_activities rather
+    than the string keys, so the groupby hashes int32 values.
+    
     Args:
         df: Normalized activities DataFrame
         period: One of "day", "week", "month", or "year"
@@ -164,6 +240,7 @@ def aggregate_by_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
     Returns:
         DataFrame aggregated by the specified period with:
         - period key (day, year_week, year_month, or year)
+        - period_start: first day of the period (tz-naive datetime)
         - total_distance_km: sum of distance
         - activity_count: number of activities
         - avg_pace_min_per_km: average pace (for running activities only)
@@ -182,27 +259,30 @@ def aggregate_by_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
         raise ValueError(f"Period must be one of {list(period_key_map.keys())}")
     
     period_key = period_key_map[period]
+    code_key = f"{period}_code"
     
-    # Aggregate distance and count
-    aggregated = df.groupby(period_key).agg({
-        "distance_km": "sum",
-        "sport_type": "count"
-    }).reset_index()
-    aggregated.columns = [period_key, "total_distance_km", "activity_count"]
+    aggregations = {
+        period_key: (period_key, "first"),
+        "total_distance_km": ("distance_km", "sum"),
+        "activity_count": ("distance_km", "size")
+    }
     
-    # Compute average pace for running activities only (if pace data exists)
+    # Average pace for running activities only (if pace data exists), computed in the
+    # same groupby pass: non-run rows are masked to NaN, which mean() skips
     if "pace_min_per_km" in df.columns:
-        running_df = df[df["sport_type"] == "Run"].copy()
-        if not running_df.empty and running_df["pace_min_per_km"].notna().any():
-            pace_agg = running_df.groupby(period_key)["pace_min_per_km"].mean().reset_index()
-            pace_agg.columns = [period_key, "avg_pace_min_per_km"]
-            aggregated = aggregated.merge(pace_agg, on=period_key, how="left")
+        is_run = (df["sport_type"] == "Run").to_numpy()
+        run_pace = np.where(is_run, df["pace_min_per_km"].to_numpy(dtype="float64"), np.nan)
+        if not np.isnan(run_pace).all():
+            df = df.assign(_run_pace=run_pace)
+            aggregations["avg_pace_min_per_km"] = ("_run_pace", "mean")
+    
+    aggregated = df.groupby(code_key, sort=True).agg(**aggregations)
+    
+    aggregated.insert(1, "period_start", _period_start(aggregated.index.to_numpy(), period))
+    aggregated = aggregated.reset_index(drop=True)
     
     # Sort by period (most recent first for day/week/month, oldest first for year)
-    if period == "year":
-        aggregated = aggregated.sort_values(period_key)
-    else:
-        aggregated = aggregated.sort_values(period_key, ascending=False)
+    if period != "year":
+        aggregated = aggregated.iloc[::-1].reset_index(drop=True)
     
     return aggregated
-